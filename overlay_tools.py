@@ -9,6 +9,7 @@ FFPROBE_CMD = '/usr/bin/ffprobe'
 CONVERT_CMD = '/usr/bin/convert'
 IDENTIFY_CMD = '/usr/bin/identify'
 MENCODER_CMD = '/usr/bin/mencoder'
+COMPARE_CMD = '/usr/bin/compare'
 
 OVERLAY_CENTER = '(W-w)/2:(H-h)/2'
 OVERLAY_BOTTOM_LEFT = '0:H-h'
@@ -20,6 +21,17 @@ DEFAULT_FFMPEG_PARAMS = '-strict experimental -ar 22500'
 DEFAULT_FRAMERATE = 5
 DEFAULT_DOWNLOAD_SIZE_CONSTRAINT = 0 # in bytes, 0 is no constraint
 
+SEGMENT_HLS = 'hls'
+SEGMENT_FMP4 = 'fmp4'
+DEFAULT_SEGMENT_TIME = 4 # in seconds
+
+# ffmpeg 4.0 or newer parameters used instead of -sameq, which is removed there;
+# the sample rate overrides 22500 of DEFAULT_FFMPEG_PARAMS, unsupported by aac
+H264_FFMPEG_PARAMS = '-c:v libx264 -c:a aac -ar 22050'
+
+DEFAULT_COMPACT_FUZZ = 2 # in percents of color distance
+DEFAULT_COMPACT_PARAMS = '-vcodec qtrle -pix_fmt argb'
+
 def create_video(image, video, length, framerate=DEFAULT_FRAMERATE, params=''):
     '''Create video from animated gif.
 
@@ -90,6 +102,198 @@ def create_video(image, video, length, framerate=DEFAULT_FRAMERATE, params=''):
             os.rmdir(os.path.join(root, name))
     os.rmdir(tmpdir)
 
+def get_image_bounding_box(image):
+    '''Get image bounding box of non-transparent pixels.
+
+    Arguments:
+    image -- The input image file.
+
+    Returns:
+    Tuple (x, y, width, height, image width, image height)
+
+    The bounding box covers non-transparent pixels of all image frames. Width and height
+    of the bounding box are 0 for fully transparent image.
+
+    '''
+    import re
+
+    # merge all frames, extract alpha and add black border so that trimming never
+    # removes opaque pixels touching the image edges
+    cmd_fmt = '%s %s -coalesce -background none -layers merge +repage -alpha extract ' \
+              '-bordercolor black -border 1 -format \'%%w %%h %%@\' info:'
+    cmd = cmd_fmt % (CONVERT_CMD, image)
+
+    p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
+    (stdoutdata, stderrdata) = p.communicate()
+
+    if p.returncode:
+        raise Exception('Return code is not null')
+
+    box_regexp = re.compile('(?P<image_width>\d+)\s(?P<image_height>\d+)\s'
+                            '(?P<width>\d+)x(?P<height>\d+)\+(?P<x>\d+)\+(?P<y>\d+)')
+    match = box_regexp.match(stdoutdata.strip())
+
+    if not match:
+        raise Exception('Can not get bounding box of %s' % image)
+
+    image_width = int(match.groupdict()['image_width']) - 2
+    image_height = int(match.groupdict()['image_height']) - 2
+    x = int(match.groupdict()['x']) - 1
+    y = int(match.groupdict()['y']) - 1
+    width = int(match.groupdict()['width'])
+    height = int(match.groupdict()['height'])
+
+    if x < 0 or y < 0 or x + width > image_width or y + height > image_height:
+        # nothing is left after trimming of the border
+        return (0, 0, 0, 0, image_width, image_height)
+
+    return (x, y, width, height, image_width, image_height)
+
+def get_images_difference(image1, image2, fuzz=DEFAULT_COMPACT_FUZZ):
+    '''Get number of different pixels of two images.
+
+    Arguments:
+    image1 -- The first image file.
+    image2 -- The second image file.
+    fuzz -- The color distance in percents to treat pixels as equal (default is 2).
+
+    Returns:
+    Number of different pixels.
+
+    '''
+
+    cmd = '%s -metric AE -fuzz %d%% %s %s null:' % (COMPARE_CMD, fuzz, image1, image2)
+
+    p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
+    (stdoutdata, stderrdata) = p.communicate()
+
+    # compare returns 1 for dissimilar images and 2 on error
+    if p.returncode > 1:
+        raise Exception('Return code is not null')
+
+    return int(float(stderrdata.split()[0]))
+
+def adjust_overlay_params(overlay_params, width, height, x, y):
+    '''Adjust overlay position for cropped overlay.
+
+    Arguments:
+    overlay_params -- Overlay position parameter of the uncropped overlay.
+    width -- The width of the uncropped overlay.
+    height -- The height of the uncropped overlay.
+    x -- The left offset of the cropped area.
+    y -- The top offset of the cropped area.
+
+    Returns:
+    Overlay position parameter for the cropped overlay.
+
+    '''
+    import re
+
+    overlay_params = re.sub(r'\b(w|overlay_w)\b', str(width), overlay_params)
+    overlay_params = re.sub(r'\b(h|overlay_h)\b', str(height), overlay_params)
+    x_expr, y_expr = overlay_params.split(':', 1)
+
+    return '(%s)+%d:(%s)+%d' % (x_expr, x, y_expr, y)
+
+def compact_overlay(image, video, overlay_params=OVERLAY_CENTER, framerate=DEFAULT_FRAMERATE,
+    fuzz=DEFAULT_COMPACT_FUZZ, params=DEFAULT_COMPACT_PARAMS):
+    '''Create compact overlay video from animated gif.
+
+    Arguments:
+    image -- The input image file.
+    video -- The output video file, its container must support params codec.
+    overlay_params -- Overlay position parameter of the image. Possible values are
+                      OVERLAY_CENTER, OVERLAY_BOTTOM_LEFT, OVERLAY_BOTTOM_RIGHT,
+                      OVERLAY_TOP_LEFT and OVERLAY_TOP_RIGHT.
+    framerate -- The framerate of the animation (default is 5).
+    fuzz -- The color distance in percents to treat frames as duplicates (default is 2).
+    params -- Additional ffmpeg video parameters, the default keeps transparency.
+
+    Returns:
+    Overlay position parameter for the compact video.
+
+    Create video with a single loop of animated image. The image is cropped to the bounding
+    box of non-transparent pixels and runs of duplicate frames are merged into one frame of
+    longer duration. The video is meant to be repeated by create_overlay_video with
+    overlay_loop.
+
+    '''
+
+    import glob
+    import tempfile
+
+    if not os.path.isabs(image):
+        image = os.path.abspath(image)
+    if not os.path.isabs(video):
+        video = os.path.abspath(video)
+
+    x, y, width, height, image_width, image_height = get_image_bounding_box(image)
+
+    # crop to the bounding box of non-transparent pixels
+    crop = ''
+    if width and height and (width, height) != (image_width, image_height):
+        crop = '-crop %dx%d+%d+%d +repage' % (width, height, x, y)
+        overlay_params = adjust_overlay_params(overlay_params, image_width, image_height, x, y)
+
+    # create temprorary directory
+    tmpdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(tmpdir)
+
+    try:
+        # extract cropped frames from animated gif
+        cmd = '%s %s -coalesce %s %%03d.png' % (CONVERT_CMD, image, crop)
+
+        p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
+        (stdoutdata, stderrdata) = p.communicate()
+
+        if p.returncode:
+            raise Exception('Return code is not null')
+
+        # merge duplicate frames, every frame is compared with the first frame of the run
+        runs = []
+        for frame in sorted(glob.glob('*.png')):
+            if runs and not get_images_difference(runs[-1][0], frame, fuzz):
+                runs[-1][1] += 1
+            else:
+                runs.append([frame, 1])
+
+        if not runs:
+            raise Exception('No frames extracted from %s' % image)
+
+        # the concat demuxer ignores duration of the last file, so the last frame is repeated
+        # and the video is limited to the animation length to get exactly one loop
+        f = open('frames.ffconcat', 'w')
+        f.write('ffconcat version 1.0\n')
+        for frame, count in runs:
+            f.write('file \'%s\'\nduration %f\n' % (frame, float(count) / framerate))
+        f.write('file \'%s\'\n' % runs[-1][0])
+        f.close()
+
+        length = float(sum([count for frame, count in runs])) / framerate
+
+        # create video from frames
+        cmd_fmt = '%s -y -f concat -i frames.ffconcat -vsync vfr -t %f %s %s'
+        cmd = cmd_fmt % (FFMPEG_CMD, length, params, video)
+
+        p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
+        (stdoutdata, stderrdata) = p.communicate()
+
+        if p.returncode:
+            raise Exception('Return code is not null')
+
+    finally:
+        # delete temprorary data
+        os.chdir(cwd)
+        for root, dirs, files in os.walk(tmpdir, topdown=False):
+            for name in files:
+                os.remove(os.path.join(root, name))
+            for name in dirs:
+                os.rmdir(os.path.join(root, name))
+        os.rmdir(tmpdir)
+
+    return overlay_params
+
 def get_image_params(image):
     '''Get image number of frames, width and height.
 
@@ -224,8 +428,49 @@ def convert_video(video, extension='mp4', params=''):
 
     return path
 
+def get_segment_params(new_video, segment_format, segment_time=DEFAULT_SEGMENT_TIME):
+    '''Get ffmpeg parameters for segmented output.
+
+    Arguments:
+    new_video -- The new video file name.
+    segment_format -- The segment format. Possible values are SEGMENT_HLS and SEGMENT_FMP4.
+    segment_time -- The segment duration in seconds (default is 4).
+
+    Returns:
+    Tuple (ffmpeg output parameters, playlist file name)
+
+    The playlist is stored next to the new video file with the m3u8 extension and is
+    rewritten by ffmpeg each time a segment is finished, so players can start consuming
+    the output before the whole video is encoded. Segments are encoded with H.264 video
+    and AAC audio, this requires ffmpeg 4.0 or newer.
+
+    '''
+
+    if segment_time <= 0:
+        raise ValueError('wrong segment_time parameter')
+
+    root, ext = os.path.splitext(new_video)
+    playlist = '%s.m3u8' % (root)
+
+    if segment_format == SEGMENT_HLS:
+        type_params = '-hls_segment_type mpegts'
+        segment_file = '%s_%%05d.ts' % (root)
+    elif segment_format == SEGMENT_FMP4:
+        type_params = '-hls_segment_type fmp4 -hls_fmp4_init_filename %s_init.mp4' % (os.path.basename(root))
+        segment_file = '%s_%%05d.m4s' % (root)
+    else:
+        raise ValueError('wrong segment_format parameter')
+
+    # force key frames at segment boundaries to get segments of equal duration
+    params_fmt = '%s -force_key_frames \'expr:gte(t,n_forced*%d)\' ' \
+                 '-f hls -hls_time %d -hls_list_size 0 -hls_playlist_type event %s -hls_segment_filename %s'
+    params = params_fmt % (H264_FFMPEG_PARAMS, segment_time, segment_time, type_params, segment_file)
+
+    return (params, playlist)
+
 def create_overlay_video(video, overlay, new_video, audio=None, overlay_params=OVERLAY_CENTER,
-    video_params=DEFAULT_FFMPEG_PARAMS):
+    video_params=DEFAULT_FFMPEG_PARAMS, segment_format=None, segment_time=DEFAULT_SEGMENT_TIME,
+    overlay_loop=False, sameq=True):
     '''Create video overlay.
 
     Arguments:
@@ -237,9 +482,16 @@ def create_overlay_video(video, overlay, new_video, audio=None, overlay_params=O
                       OVERLAY_BOTTOM_LEFT, OVERLAY_BOTTOM_RIGHT, OVERLAY_TOP_LEFT and
                       OVERLAY_TOP_RIGHT.
     video_params -- Additional ffmpeg video parameters.
+    segment_format -- The segmented output format, None is a single file. Possible values are
+                      SEGMENT_HLS and SEGMENT_FMP4.
+    segment_time -- The segment duration in seconds (default is 4).
+    overlay_loop -- Repeat overlay video until the end of input video (default is False),
+                    requires ffmpeg 4.0 or newer.
+    sameq -- Use ffmpeg -sameq option (default is True). Otherwise the video is encoded with
+             H264_FFMPEG_PARAMS, it is always so for segmented output and overlay loop.
 
     Returns:
-    None.
+    The output file name, it is the playlist file name for segmented output.
 
     Create overlay of video and store it into new video file. One may change a default soundtrack
     of input video with help new audio soundtrack file. Soundtrack file may be any of supported by
@@ -254,14 +506,31 @@ def create_overlay_video(video, overlay, new_video, audio=None, overlay_params=O
     if audio and not os.path.exists(audio):
         raise IOError('No such file %s' % audio)
 
+    # segmented output and overlay loop require ffmpeg without -sameq support
+    if segment_format or overlay_loop:
+        sameq = False
+
+    sameq_params = ''
+    if sameq:
+        sameq_params = '-sameq'
+    elif segment_format:
+        segment_params, new_video = get_segment_params(new_video, segment_format, segment_time)
+        video_params = '%s %s' % (video_params, segment_params)
+    else:
+        video_params = '%s %s' % (video_params, H264_FFMPEG_PARAMS)
+
+    if overlay_loop:
+        overlay = '%s:loop=0' % (overlay)
+        overlay_params = '%s:shortest=1' % (overlay_params)
+
     if audio:
         video_length, video_width, video_height = get_video_params(video)
-        cmd_fmt = '%s -y -sameq -i %s -t %d -i %s -vf \'movie=%s [logo]; [in][logo] overlay=%s [out]\' %s %s'
-        cmd = cmd_fmt % (FFMPEG_CMD, audio, video_length, video, overlay,
+        cmd_fmt = '%s -y %s -i %s -t %d -i %s -vf \'movie=%s [logo]; [in][logo] overlay=%s [out]\' %s %s'
+        cmd = cmd_fmt % (FFMPEG_CMD, sameq_params, audio, video_length, video, overlay,
             overlay_params, video_params, new_video)
     else:
-        cmd_fmt = '%s -y -sameq -i %s -vf \'movie=%s [logo]; [in][logo] overlay=%s [out]\' %s %s'
-        cmd = cmd_fmt % (FFMPEG_CMD, video, overlay, overlay_params, video_params, new_video)
+        cmd_fmt = '%s -y %s -i %s -vf \'movie=%s [logo]; [in][logo] overlay=%s [out]\' %s %s'
+        cmd = cmd_fmt % (FFMPEG_CMD, sameq_params, video, overlay, overlay_params, video_params, new_video)
 
     p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
     (stdoutdata, stderrdata) = p.communicate()
@@ -269,6 +538,8 @@ def create_overlay_video(video, overlay, new_video, audio=None, overlay_params=O
     if p.returncode:
         raise Exception('Return code is not null')
 
+    return new_video
+
 def set_video_hue_and_saturation(video, new_video, hue=0, saturation=1, video_params=DEFAULT_FFMPEG_PARAMS):
     '''Set video hue and saturation.
 
@@ -319,7 +590,7 @@ def set_video_brightness_and_contrast(video, new_video, brightness=0, contrast=0
     if p.returncode:
         raise Exception('Return code is not null')
 
-def split_video(video, parts, template='_part', video_params=''):
+def split_video(video, parts, template='_part', video_params='', sameq=True):
     '''Split video onto parts.
 
     Arguments:
@@ -327,6 +598,8 @@ def split_video(video, parts, template='_part', video_params=''):
     parts -- The list of Tuples (start position, stop position).
     template -- The temaplte to create file name for video part (default is '_part')
     video_params -- Additional ffmpeg video parameters.
+    sameq -- Use ffmpeg -sameq option and mpeg parts (default is True). Otherwise the parts
+             are mp4 files encoded with H264_FFMPEG_PARAMS.
 
     Returns:
     List of parts' file names.
@@ -338,8 +611,14 @@ def split_video(video, parts, template='_part', video_params=''):
     video_parts = []
     video_length, video_width, video_height = get_video_params(video)
     root, ext = os.path.splitext(video)
-    ext = '.mpeg'
-    cmd_tmpl = '%s -y -sameq -ss %d -t %d -i %s %s %s'
+    if sameq:
+        ext = '.mpeg'
+        sameq_params = '-sameq'
+    else:
+        ext = '.mp4'
+        sameq_params = ''
+        video_params = '%s %s' % (video_params, H264_FFMPEG_PARAMS)
+    cmd_tmpl = '%s -y %s -ss %d -t %d -i %s %s %s'
     i = 0
 
     for start_pos, stop_pos in parts:
@@ -351,7 +630,8 @@ def split_video(video, parts, template='_part', video_params=''):
         video_part = '%s%s%d%s' % (root, template, i, ext)
         video_parts.append(video_part)
 
-        cmd = cmd_tmpl % (FFMPEG_CMD, start_pos, stop_pos - start_pos, video, video_params, video_part)
+        cmd = cmd_tmpl % (FFMPEG_CMD, sameq_params, start_pos, stop_pos - start_pos, video,
+            video_params, video_part)
 
         p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
         (stdoutdata, stderrdata) = p.communicate()
@@ -361,31 +641,61 @@ def split_video(video, parts, template='_part', video_params=''):
 
     return video_parts
 
-def merge_video(videos, new_video):
+def merge_video(videos, new_video, segment_format=None, segment_time=DEFAULT_SEGMENT_TIME, concat=False):
     '''Merge videos into new video.
 
     Arguments:
     videos -- The list of video files to merge.
     new_video -- The new video file name.
+    segment_format -- The segmented output format, None is a single file. Possible values are
+                      SEGMENT_HLS and SEGMENT_FMP4.
+    segment_time -- The segment duration in seconds (default is 4).
+    concat -- Merge with ffmpeg concat demuxer instead of mencoder, the video files are
+              copied as is, so they must have the same codecs (default is False).
 
     Returns:
-    None
+    The output file name, it is the playlist file name for segmented output.
 
-    Merge video files into new video file.
+    Merge video files into new video file. Segmented output is encoded by ffmpeg instead of
+    mencoder, since HLS players do not accept codecs of the input videos as is.
 
     '''
 
     if videos:
 
-        cmd = '%s -forceidx -oac copy -ovc copy -o %s %s' % (MENCODER_CMD, new_video, ' '.join(videos))
+        list_file = None
+        try:
+            if segment_format or concat:
+                if segment_format:
+                    output_params, new_video = get_segment_params(new_video, segment_format, segment_time)
+                else:
+                    output_params = '-c copy'
+                list_file = '%s.ffconcat' % (os.path.splitext(new_video)[0])
+                f = open(list_file, 'w')
+                f.write('ffconcat version 1.0\n')
+                for v in videos:
+                    f.write('file \'%s\'\n' % os.path.abspath(v).replace('\'', '\'\\\'\''))
+                f.close()
+
+                cmd_fmt = '%s -y -f concat -safe 0 -i %s %s %s'
+                cmd = cmd_fmt % (FFMPEG_CMD, list_file, output_params, new_video)
+            else:
+                cmd = '%s -forceidx -oac copy -ovc copy -o %s %s' % (MENCODER_CMD, new_video, ' '.join(videos))
 
-        p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
-        (stdoutdata, stderrdata) = p.communicate()
+            p = sp.Popen(cmd, shell=True, stdout=sp.PIPE, stderr=sp.PIPE)
+            (stdoutdata, stderrdata) = p.communicate()
+
+        finally:
+            if list_file and os.path.exists(list_file):
+                os.remove(list_file)
 
         if p.returncode:
             raise Exception('Return code is not null')
 
-def overlay_video_worker(video, overlays, new_video, video_params=DEFAULT_FFMPEG_PARAMS):
+    return new_video
+
+def overlay_video_worker(video, overlays, new_video, video_params=DEFAULT_FFMPEG_PARAMS,
+    segment_format=None, segment_time=DEFAULT_SEGMENT_TIME, compact=False):
     '''Complex overlay video.
 
     Arguments:
@@ -399,11 +709,19 @@ def overlay_video_worker(video, overlays, new_video, video_params=DEFAULT_FFMPEG
                 OVERLAY_BOTTOM_LEFT, OVERLAY_BOTTOM_RIGHT, OVERLAY_TOP_LEFT and OVERLAY_TOP_RIGHT.
     new_video -- The new video file name.
     video_params -- Additional ffmpeg video parameters.
+    segment_format -- The segmented output format, None is a single file. Possible values are
+                      SEGMENT_HLS and SEGMENT_FMP4.
+    segment_time -- The segment duration in seconds (default is 4).
+    compact -- Use compact overlay video for animated images (default is False).
 
     Returns:
-    None.
+    The output file name, it is the playlist file name for segmented output.
 
-    Create complex overlay for video file and store result into new video file.
+    Create complex overlay for video file and store result into new video file. Segmented
+    output is written by the final merge after all parts are rendered, so unlike
+    create_overlay_video it gives no earlier start of playback. Segmented output and compact
+    overlay require ffmpeg 4.0 or newer, all parts are encoded with H264_FFMPEG_PARAMS then
+    and merged by ffmpeg.
 
     '''
 
@@ -429,7 +747,10 @@ def overlay_video_worker(video, overlays, new_video, video_params=DEFAULT_FFMPEG
         for i in xrange(0, len(points) - 1):
             parts.append((points[i], points[i + 1]))
          
-        part_files = split_video(video, parts)
+        # ffmpeg versions supporting segmented output and overlay loop do not support -sameq
+        sameq = not (segment_format or compact)
+
+        part_files = split_video(video, parts, sameq=sameq)
 
         cache_files = []
         merge_files = []
@@ -478,10 +799,16 @@ def overlay_video_worker(video, overlays, new_video, video_params=DEFAULT_FFMPEG
                     return 1
 
                 image_video = ''
+                overlay_loop = False
+                image_path, image_ext = os.path.splitext(overlay_file)
                 if image_num_frames == 1:
                     image_video = overlay_file
+                elif compact:
+                    image_video = '%s_compact.mov' % (image_path)
+                    part_pos = compact_overlay(overlay_file, image_video, part_pos)
+                    overlay_loop = True
+                    cache_files.append(image_video)
                 else:
-                    image_path, image_ext = os.path.splitext(overlay_file)
                     image_video = '%s.mp4' % (image_path)
                     create_video(overlay_file, image_video, part_length)
                     cache_files.append(image_video)
@@ -494,7 +821,9 @@ def overlay_video_worker(video, overlays, new_video, video_params=DEFAULT_FFMPEG
                                      overlay_part, 
                                      audio=part_track,
                                      overlay_params=part_pos,
-                                     video_params=video_params)
+                                     video_params=video_params,
+                                     overlay_loop=overlay_loop,
+                                     sameq=sameq)
 
                 cache_files.append(part_files[i])
                 merge_files.append(overlay_part)
@@ -502,11 +831,13 @@ def overlay_video_worker(video, overlays, new_video, video_params=DEFAULT_FFMPEG
             else:
                 merge_files.append(part_files[i])
 
-        merge_video(merge_files, new_video)
+        new_video = merge_video(merge_files, new_video, segment_format, segment_time, concat=not sameq)
 
         for f in cache_files + merge_files:
             os.remove(f)
 
+        return new_video
+
 def regular_http_download(url, filename, size_constraint=DEFAULT_DOWNLOAD_SIZE_CONSTRAINT):
     '''Download file from url.
 
@@ -548,7 +879,8 @@ def main(argv):
     '''
     from optparse import OptionParser
 
-    usage = 'usage: %prog -i IMAGE [-f FRAMERATE] [-a AUDIO] [-o output_video] [--overlay-ceter | ...] <input_video>'
+    usage = 'usage: %prog -i IMAGE [-f FRAMERATE] [-a AUDIO] [-o output_video] [--overlay-ceter | ...] ' \
+            '[--segment-format FORMAT [--segment-time SECONDS]] [--compact [--compact-fuzz FUZZ]] <input_video>'
     parser = OptionParser(usage)
 
     parser.add_option('--overlay-center',
@@ -609,6 +941,36 @@ def main(argv):
         metavar='FILE',
         help='set audio file as soundtrack')
 
+    parser.add_option('--segment-format',
+        action='store',
+        type='choice',
+        choices=[SEGMENT_HLS, SEGMENT_FMP4],
+        dest='segment_format',
+        metavar='FORMAT',
+        help='write output video as segments plus m3u8 playlist, FORMAT is %s or %s' % (SEGMENT_HLS, SEGMENT_FMP4))
+
+    parser.add_option('--segment-time',
+        action='store',
+        type='int',
+        dest='segment_time',
+        default=DEFAULT_SEGMENT_TIME,
+        metavar='SECONDS',
+        help='set segment duration in SECONDS (default is %d)' % DEFAULT_SEGMENT_TIME)
+
+    parser.add_option('--compact',
+        action='store_true',
+        dest='compact',
+        default=False,
+        help='crop overlay, merge its duplicate frames and loop it instead of repeating')
+
+    parser.add_option('--compact-fuzz',
+        action='store',
+        type='int',
+        dest='compact_fuzz',
+        default=DEFAULT_COMPACT_FUZZ,
+        metavar='FUZZ',
+        help='set color distance in percents to treat overlay frames as duplicates (default is %d)' % DEFAULT_COMPACT_FUZZ)
+
     (options, args) = parser.parse_args()
 
     overlay_place = OVERLAY_CENTER
@@ -650,24 +1012,34 @@ def main(argv):
         print >> sys.stderr, 'Image is broken!'
         return 1
 
+    framerate = DEFAULT_FRAMERATE
+    if options.framerate:
+        framerate = options.framerate
+
+    overlay_loop = False
     if image_num_frames == 1:
         image_video = image
+    elif options.compact:
+        image_path, image_ext = os.path.splitext(image)
+        image_video = '%s_compact.mov' % (image_path)
+        overlay_place = compact_overlay(image, image_video, overlay_place, framerate, options.compact_fuzz)
+        overlay_loop = True
     else:
         image_path, image_ext = os.path.splitext(image)
         image_video = '%s.mp4' % (image_path)
-
-        if options.framerate:
-            create_video(image, image_video, video_length, options.framerate)
-        else:
-            create_video(image, image_video, video_length)
+        create_video(image, image_video, video_length, framerate)
 
     if options.audio:
         audio = options.audio
         if not os.path.isabs(audio):
             audio = os.path.abspath(audio)
-        create_overlay_video(video, image_video, new_video, audio, overlay_place)
+        create_overlay_video(video, image_video, new_video, audio, overlay_place,
+            segment_format=options.segment_format, segment_time=options.segment_time,
+            overlay_loop=overlay_loop)
     else:
-        create_overlay_video(video, image_video, new_video, overlay_params=overlay_place)
+        create_overlay_video(video, image_video, new_video, overlay_params=overlay_place,
+            segment_format=options.segment_format, segment_time=options.segment_time,
+            overlay_loop=overlay_loop)
 
     return 0
 